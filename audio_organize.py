@@ -3,6 +3,8 @@ import shutil
 import re
 import logging
 from tinytag import TinyTag
+from metadata_keys import DuplicateIndex
+from io_scheduler import list_audio_files, probe_files
 
 SUPPORTED_FORMATS = ('.mp3', '.flac', '.ogg', '.wma', '.m4a', '.wav', '.aiff')
 
@@ -65,27 +67,28 @@ def is_better_quality(info1, info2):
             return True
     return False
 
-def find_duplicates(music_folder):
+def find_duplicates(music_folder, scheduled_io=False):
     files_info = {}
     duplicates = []
-
-    for root, _, files in os.walk(music_folder):
-        for file in files:
-            if file.endswith(SUPPORTED_FORMATS):
-                file_path = os.path.join(root, file)
-                info = get_audio_info(file_path)
-                key = (info['title'], info['artist'])
-
-                if key in files_info:
-                    existing_file = files_info[key]
-                    logging.info(f"Comparing:\n1. {existing_file['path']} (Format: {existing_file['format_priority']}, Bitrate: {existing_file['bitrate']} kbps, Filesize: {existing_file['filesize']} bytes, Bitdepth: {existing_file['bitdepth']}, Samplerate: {existing_file['samplerate']} Hz, Duration: {existing_file['length']} s)\n2. {file_path} (Format: {info['format_priority']}, Bitrate: {info['bitrate']} kbps, Filesize: {info['filesize']} bytes, Bitdepth: {info['bitdepth']}, Samplerate: {info['samplerate']} Hz, Duration: {info['length']} s)")
-                    if is_better_quality(info, existing_file):
-                        duplicates.append(existing_file['path'])
-                        files_info[key] = info
-                    else:
-                        duplicates.append(file_path)
-                else:
-                    files_info[key] = info
+    index = DuplicateIndex()
+
+    file_paths = list_audio_files(music_folder, SUPPORTED_FORMATS)
+    for file_path, info in probe_files(file_paths, get_audio_info, scheduled_io):
+        key, exact = index.match((info['title'], info['artist']))
+        if not exact:
+            logging.warning(f"Possible duplicate of {files_info[key]['path']}, leaving {file_path} in place for review.")
+            continue
+
+        if key in files_info:
+            existing_file = files_info[key]
+            logging.info(f"Comparing:\n1. {existing_file['path']} (Format: {existing_file['format_priority']}, Bitrate: {existing_file['bitrate']} kbps, Filesize: {existing_file['filesize']} bytes, Bitdepth: {existing_file['bitdepth']}, Samplerate: {existing_file['samplerate']} Hz, Duration: {existing_file['length']} s)\n2. {file_path} (Format: {info['format_priority']}, Bitrate: {info['bitrate']} kbps, Filesize: {info['filesize']} bytes, Bitdepth: {info['bitdepth']}, Samplerate: {info['samplerate']} Hz, Duration: {info['length']} s)")
+            if is_better_quality(info, existing_file):
+                duplicates.append(existing_file['path'])
+                files_info[key] = info
+            else:
+                duplicates.append(file_path)
+        else:
+            files_info[key] = info
 
     return duplicates
 
@@ -96,28 +99,26 @@ def remove_duplicates(duplicates):
 def sanitize_filename(name):
     return re.sub(r'[<>:"/\\|?*\x00-\x1F]', '_', name)
 
-def organize_music(music_folder, output_folder):
+def organize_music(music_folder, output_folder, scheduled_io=False):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    for root, _, files in os.walk(music_folder):
-        for file in files:
-            if file.endswith(SUPPORTED_FORMATS):
-                file_path = os.path.join(root, file)
-                info = get_audio_info(file_path)
-                artist_folder = os.path.join(output_folder, sanitize_filename(info['artist']))
-                album_folder = os.path.join(artist_folder, sanitize_filename(info['album']))
+    file_paths = list_audio_files(music_folder, SUPPORTED_FORMATS)
+    for file_path, info in probe_files(file_paths, get_audio_info, scheduled_io):
+        artist_folder = os.path.join(output_folder, sanitize_filename(info['artist']))
+        album_folder = os.path.join(artist_folder, sanitize_filename(info['album']))
 
-                if not os.path.exists(album_folder):
-                    os.makedirs(album_folder)
+        if not os.path.exists(album_folder):
+            os.makedirs(album_folder)
 
-                shutil.move(file_path, os.path.join(album_folder, file))
+        shutil.move(file_path, os.path.join(album_folder, os.path.basename(file_path)))
 
 if __name__ == '__main__':
     music_folder = '/Volumes/T7 Media/MasterMusicLibrary/'
     output_folder = '/Volumes/T7 Media/MusicLibrary'
+    scheduled_io = False  # Set to True to probe in physical disk order (spinning disks)
 
-    duplicates = find_duplicates(music_folder)
+    duplicates = find_duplicates(music_folder, scheduled_io)
     input("Press Enter to remove duplicates...")
     remove_duplicates(duplicates)
-    organize_music(music_folder, output_folder)
\ No newline at end of file
+    organize_music(music_folder, output_folder, scheduled_io)
\ No newline at end of file
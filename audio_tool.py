@@ -1,4 +1,3 @@
-import os
 import wave
 import mutagen
 from mutagen.flac import FLAC
@@ -7,9 +6,11 @@ from mutagen.mp4 import MP4
 from mutagen.oggvorbis import OggVorbis
 from mutagen.aiff import AIFF
 from pydub import AudioSegment
-import shutil
+from metadata_keys import DuplicateIndex
+from pipeline import LibraryPlacer
 
 SUPPORTED_FORMATS = ('.wav', '.aiff', '.flac', '.alac', '.wma', '.ape', '.wv', '.tta', '.mp4', '.m4a', '.mp3', '.aac', '.ogg', '.opus', '.mpc', '.atrac')
+QUALITY_FIELDS = ('format', 'bit_depth', 'sample_rate', 'channels', 'bitrate')
 
 def check_file_integrity(file_path):
     try:
@@ -177,53 +178,38 @@ def compare_quality(new_quality, existing_quality):
     else:
         return False
 
-def organize_music_library(source_folder, destination_folder, review_folder, test_mode=False, copy_mode=False):
-    library = {}
+def organize_music_library(source_folder, destination_folder, review_folder, test_mode=False, copy_mode=False, scheduled_io=False):
+    library_quality = {}
     log_entries = []
+    index = DuplicateIndex()
+    placer = LibraryPlacer(destination_folder, review_folder, log_entries, test_mode, copy_mode)
+    library = placer.library
 
-    for root, _, files in os.walk(source_folder):
-        for file in files:
-            if not file.lower().endswith(SUPPORTED_FORMATS):
-                continue
-
-            file_path = os.path.join(root, file)
-            quality = get_audio_quality(file_path)
-            if not quality:
-                log_entries.append(f"Moving {file_path} to review folder due to insufficient metadata or corruption.")
-                if not test_mode:
-                    os.makedirs(review_folder, exist_ok=True)
-                    shutil.move(file_path, os.path.join(review_folder, file))
-                continue
-
-            key = (quality['title'], quality['artist'], quality['album'])
-            if key not in library:
-                library[key] = file_path
-                log_entries.append(f"Adding {file_path} to library.")
-            else:
-                existing_quality = get_audio_quality(library[key])
-                if not existing_quality:
-                    continue
-
-                if compare_quality(quality, existing_quality):
-                    log_entries.append(f"Replacing {library[key]} with {file_path} due to higher quality.")
-                    if not test_mode and not copy_mode:
-                        os.remove(library[key])
-                    library[key] = file_path
-                else:
-                    log_entries.append(f"Skipping {file_path} due to lower quality.")
-                    if not test_mode and not copy_mode:
-                        os.remove(file_path)
-
-    for (title, artist, album), file_path in library.items():
-        artist_folder = os.path.join(destination_folder, artist)
-        album_folder = os.path.join(artist_folder, album)
-        os.makedirs(album_folder, exist_ok=True)
-        log_entries.append(f"Copying {file_path} to {album_folder}.")
-        if not test_mode:
-            if copy_mode:
-                shutil.copy(file_path, os.path.join(album_folder, os.path.basename(file_path)))
-            else:
-                shutil.move(file_path, os.path.join(album_folder, os.path.basename(file_path)))
+    def comparable(quality):
+        # Only what compare_quality reads is kept per track, not the tags.
+        return {field: quality.get(field) for field in QUALITY_FIELDS}
+
+    def decide(file_path, quality):
+        if not quality:
+            return placer.review(file_path, "due to insufficient metadata or corruption")
+
+        key, exact = index.match((quality['title'], quality['artist'], quality['album']))
+        if not exact:
+            return placer.review(file_path, f"as a possible duplicate of {library[key]}")
+
+        if key not in library:
+            library_quality[key] = comparable(quality)
+            return placer.add(key, file_path)
+
+        if not compare_quality(quality, library_quality[key]):
+            log_entries.append(f"Skipping {file_path} due to lower quality.")
+            return placer.remove(key, file_path)
+
+        log_entries.append(f"Replacing {library[key]} with {file_path} due to higher quality.")
+        library_quality[key] = comparable(quality)
+        return placer.replace(key, file_path)
+
+    log_entries.extend(placer.run(source_folder, SUPPORTED_FORMATS, get_audio_quality, decide, scheduled_io))
 
     with open("organize_music_log.txt", "w") as log_file:
         log_file.write("\n".join(log_entries))
@@ -235,5 +221,6 @@ if __name__ == "__main__":
     review_folder = "path/to/your/review/folder"
     test_mode = False  # Set to True to test without moving files
     copy_mode = False  # Set to True to copy files instead of moving
+    scheduled_io = False  # Set to True to probe in physical disk order (spinning disks)
 
-    organize_music_library(source_folder, destination_folder, review_folder, test_mode, copy_mode)
\ No newline at end of file
+    organize_music_library(source_folder, destination_folder, review_folder, test_mode, copy_mode, scheduled_io)
\ No newline at end of file
@@ -0,0 +1,63 @@
+import sys
+import time
+from io_scheduler import drop_from_cache, list_audio_files, read_head_tail, scheduled_probe
+from pipeline import scan_library
+
+SUPPORTED_FORMATS = ('.wav', '.aiff', '.flac', '.alac', '.wma', '.ape', '.wv', '.tta', '.mp4', '.m4a', '.mp3', '.aac', '.ogg', '.opus', '.mpc', '.atrac')
+
+# Times a tag-only probe (head + tail read) over the same files four ways:
+# a plain loop in os.walk order (the baseline), the organizers' pipeline with
+# scheduled_io off and on, and scheduled_probe's library-wide physical order
+# (what audio_organize uses with scheduled_io on). Page cache is dropped for
+# the file set before every run so each one hits the disk; on rotational media
+# the difference is seek time.
+
+def evict(file_paths):
+    return all([drop_from_cache(file_path) for file_path in file_paths])
+
+def run_walk_order(folder, file_paths):
+    for file_path in file_paths:
+        read_head_tail(file_path)
+
+def run_pipeline_walk_order(folder, file_paths):
+    scan_library(folder, SUPPORTED_FORMATS, read_head_tail, lambda file_path, result: [])
+
+def run_pipeline_scheduled(folder, file_paths):
+    scan_library(folder, SUPPORTED_FORMATS, read_head_tail, lambda file_path, result: [], scheduled_io=True)
+
+def run_scheduled_probe(folder, file_paths):
+    for _ in scheduled_probe(file_paths, read_head_tail):
+        pass
+
+RUNS = {
+    'walk order': run_walk_order,
+    'pipeline': run_pipeline_walk_order,
+    'pipeline + scheduled_io': run_pipeline_scheduled,
+    'scheduled_probe': run_scheduled_probe,
+}
+
+def benchmark(folder, rounds=3):
+    file_paths = list_audio_files(folder, SUPPORTED_FORMATS)
+    if not file_paths:
+        print(f"No audio files found in {folder}")
+        return
+    if not evict(file_paths):
+        print("Warning: could not drop page cache, timings will include cached reads.")
+
+    results = {name: [] for name in RUNS}
+    for _ in range(rounds):
+        for name, run in RUNS.items():
+            evict(file_paths)
+            start = time.perf_counter()
+            run(folder, file_paths)
+            results[name].append(time.perf_counter() - start)
+
+    print(f"Files: {len(file_paths)}, rounds: {rounds}")
+    baseline = min(results['walk order'])
+    for name, timings in results.items():
+        best = min(timings)
+        print(f"{name:>24}: best {best:.3f} s, {len(file_paths) / best:.1f} files/s, {baseline / best:.2f}x")
+
+if __name__ == "__main__":
+    target_directory = sys.argv[1] if len(sys.argv) > 1 else "/Volumes/T7 Media/MasterMusicLibrary/"
+    benchmark(target_directory)
@@ -0,0 +1,306 @@
+import os
+import sys
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HEAD_BYTES = 128 * 1024
+TAIL_BYTES = 8 * 1024
+
+ROTATIONAL_WORKERS = 1
+SOLID_STATE_WORKERS = 4
+UNKNOWN_DEVICE_WORKERS = 2
+MAX_DEVICE_WORKERS = 8
+QUEUE_DEPTH_PER_WORKER = 4
+ADAPT_WINDOW = 32
+
+# struct fiemap header followed by a single struct fiemap_extent (linux/fiemap.h)
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct('=QQIIII')
+FIEMAP_EXTENT = struct.Struct('=QQQQQIIII')
+
+def list_audio_files(folder, extensions):
+    file_paths = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.lower().endswith(extensions):
+                file_paths.append(os.path.join(root, file))
+    return file_paths
+
+def walk_audio_directories(folder, extensions, scheduled=False, exclude=()):
+    # Streaming counterpart of list_audio_files: yields each directory's audio
+    # files as soon as the directory has been listed, in physical read order
+    # when the scheduler is on. Directories in exclude are pruned, so files an
+    # organizer places while the walk is running are never picked up again.
+    excluded = {os.path.realpath(path) for path in exclude}
+    for root, dirs, files in os.walk(folder):
+        if excluded:
+            dirs[:] = [d for d in dirs if os.path.realpath(os.path.join(root, d)) not in excluded]
+        file_paths = [os.path.join(root, file) for file in files if file.lower().endswith(extensions)]
+        if file_paths:
+            yield root, order_for_reads(file_paths) if scheduled else file_paths
+
+def physical_offset(file_path):
+    # First physical extent of the file, or None where FIEMAP is unavailable.
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return None
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        buffer = bytearray(FIEMAP_HEADER.size + FIEMAP_EXTENT.size)
+        FIEMAP_HEADER.pack_into(buffer, 0, 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, buffer)
+        mapped_extents = FIEMAP_HEADER.unpack_from(buffer, 0)[3]
+        if not mapped_extents:
+            return None
+        return FIEMAP_EXTENT.unpack_from(buffer, FIEMAP_HEADER.size)[1]
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+def read_order_key(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return (0, 1, 0, file_path)
+    offset = physical_offset(file_path)
+    if offset is not None:
+        return (stat.st_dev, 0, offset, file_path)
+    return (stat.st_dev, 1, stat.st_ino, file_path)
+
+def order_for_reads(file_paths):
+    keyed = sorted((read_order_key(file_path), file_path) for file_path in file_paths)
+    return [file_path for _, file_path in keyed]
+
+def is_rotational(file_path):
+    # True/False on Linux, None when the device type cannot be determined.
+    try:
+        dev = os.stat(file_path).st_dev
+    except OSError:
+        return None
+    block = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    if not os.path.exists(block):
+        return None
+    device = os.path.realpath(block)
+    for candidate in (device, os.path.dirname(device)):
+        try:
+            with open(os.path.join(candidate, 'queue', 'rotational')) as f:
+                return f.read().strip() == '1'
+        except OSError:
+            continue
+    return None
+
+def device_workers(file_path):
+    rotational = is_rotational(file_path)
+    if rotational is None:
+        return UNKNOWN_DEVICE_WORKERS
+    return ROTATIONAL_WORKERS if rotational else SOLID_STATE_WORKERS
+
+def _advise(fd, offset, length, advice):
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+            return True
+        except OSError:
+            pass
+    return False
+
+def prefetch_tag_regions(file_path, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+    # Tags live in the first few KB (ID3v2, FLAC metadata, RIFF/AIFF chunks) and
+    # the last few KB (ID3v1, APEv2). Call this for files still waiting in the
+    # queue so the kernel can fetch those regions while earlier files are being
+    # probed. Only a hint: where posix_fadvise is missing (macOS) it does nothing.
+    if not hasattr(os, 'POSIX_FADV_WILLNEED'):
+        return False
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        size = os.fstat(fd).st_size
+        tail_start = max(size - tail_bytes, 0)
+        advised = _advise(fd, 0, min(head_bytes, size), os.POSIX_FADV_WILLNEED)
+        if advised and tail_start > head_bytes:
+            _advise(fd, tail_start, size - tail_start, os.POSIX_FADV_WILLNEED)
+        return advised
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+def read_head_tail(file_path, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+    with open(file_path, 'rb') as f:
+        fd = f.fileno()
+        if hasattr(os, 'POSIX_FADV_SEQUENTIAL'):
+            _advise(fd, 0, head_bytes, os.POSIX_FADV_SEQUENTIAL)
+        head = f.read(head_bytes)
+        size = os.fstat(fd).st_size
+        tail = b''
+        if size > head_bytes:
+            f.seek(max(size - tail_bytes, head_bytes))
+            tail = f.read(tail_bytes)
+        return head, tail
+
+def drop_from_cache(file_path):
+    if not hasattr(os, 'POSIX_FADV_DONTNEED'):
+        return False
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        return _advise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+class AdaptiveLimit:
+    # Caps concurrent probes on one device and hill-climbs the cap: after every
+    # window of completions the cap moves one step, and the direction flips
+    # whenever throughput fell compared with the previous window. Callers are
+    # let through in ticket order, so files already sorted into physical order
+    # are read in that order whichever thread picks them up.
+
+    def __init__(self, initial, maximum=MAX_DEVICE_WORKERS, window=ADAPT_WINDOW):
+        self.limit = max(1, min(initial, maximum))
+        self.maximum = maximum
+        self.window = window
+        self.direction = 1
+        self.active = 0
+        self.completed = 0
+        self.last_rate = None
+        self.window_start = time.monotonic()
+        self.issued = 0
+        self.serving = 0
+        self.condition = threading.Condition()
+
+    def ticket(self):
+        # Take a place in line where the submission order is still known.
+        with self.condition:
+            ticket = self.issued
+            self.issued += 1
+            return ticket
+
+    def acquire(self, ticket=None):
+        if ticket is None:
+            ticket = self.ticket()
+        with self.condition:
+            while ticket != self.serving or self.active >= self.limit:
+                self.condition.wait()
+            self.serving += 1
+            self.active += 1
+            self.condition.notify_all()
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.completed += 1
+            if self.completed >= self.window:
+                self._adjust()
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _adjust(self):
+        now = time.monotonic()
+        rate = self.completed / max(now - self.window_start, 1e-9)
+        if self.last_rate is not None and rate < self.last_rate:
+            self.direction = -self.direction
+        self.limit = max(1, min(self.limit + self.direction, self.maximum))
+        self.last_rate = rate
+        self.completed = 0
+        self.window_start = now
+
+    def run(self, func, file_path, ticket=None):
+        self.acquire(ticket)
+        try:
+            return func(file_path)
+        finally:
+            self.release()
+
+def device_limit(file_path):
+    # A spinning disk stays at one reader: a second one only adds seeks and
+    # gives up the physical order the files were sorted into.
+    if is_rotational(file_path):
+        return AdaptiveLimit(ROTATIONAL_WORKERS, maximum=ROTATIONAL_WORKERS)
+    return AdaptiveLimit(device_workers(file_path))
+
+class DeviceLimits:
+    # One AdaptiveLimit per device, seeded from the media type. admit() hands
+    # out tickets in walk order; run() waits for the file's ticket to come up.
+
+    def __init__(self):
+        self.limits = {}
+        self.tickets = {}
+        self.lock = threading.Lock()
+
+    def for_path(self, file_path):
+        try:
+            dev = os.stat(file_path).st_dev
+        except OSError:
+            dev = None
+        with self.lock:
+            if dev not in self.limits:
+                self.limits[dev] = device_limit(file_path)
+            return self.limits[dev]
+
+    def admit(self, file_path):
+        limit = self.for_path(file_path)
+        with self.lock:
+            self.tickets[file_path] = (limit, limit.ticket())
+
+    def run(self, func, file_path):
+        with self.lock:
+            limit, ticket = self.tickets.pop(file_path, (None, None))
+        if limit is None:
+            limit = self.for_path(file_path)
+        return limit.run(func, file_path, ticket)
+
+def probe_files(file_paths, func, scheduled=False):
+    # Plain walk order unless the scheduler is switched on.
+    if scheduled:
+        yield from scheduled_probe(file_paths, func)
+        return
+    for file_path in file_paths:
+        yield file_path, func(file_path)
+
+def scheduled_probe(file_paths, func, prefetch=True):
+    # Yields (file_path, func(file_path)) in physical read order. Every device
+    # gets its own pool, gated by an AdaptiveLimit, and submissions are kept a
+    # bounded distance ahead of the consumer. Tag-region hints are issued at
+    # submission, so they cover files still queued behind the running probes.
+    ordered = sorted((read_order_key(file_path), file_path) for file_path in file_paths)
+    pools = {}
+    pending = deque()
+
+    try:
+        for (dev, *_), file_path in ordered:
+            if dev not in pools:
+                pools[dev] = (ThreadPoolExecutor(max_workers=MAX_DEVICE_WORKERS), device_limit(file_path))
+            pool, limit = pools[dev]
+            if prefetch:
+                prefetch_tag_regions(file_path)
+            pending.append((file_path, pool.submit(limit.run, func, file_path, limit.ticket())))
+            while len(pending) > MAX_DEVICE_WORKERS * QUEUE_DEPTH_PER_WORKER:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+    finally:
+        for pool, _ in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,169 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+LEADING_ARTICLES = ('the ',)
+# A credit needs text before it and either a bracket, a separator or an
+# unambiguous "feat."/"ft."/"featuring", so "Feat of Strength" stays intact.
+FEATURING_PATTERN = re.compile(
+    r'(?<=\S)(?:\s*[\(\[]\s*(?:feat|ft|featuring)\b\.?'
+    r'|\s*[,\-\u2013]\s*(?:feat|ft|featuring)\b\.?'
+    r'|\s+(?:feat\.|ft\.|featuring\b))\s.*$',
+    re.IGNORECASE
+)
+VERSION_PATTERN = re.compile(
+    r'\s*(?:[\(\[][^\(\)\[\]]*\b(?:remaster(?:ed)?|deluxe|expanded|anniversary|bonus track|album version)\b[^\(\)\[\]]*[\)\]]'
+    r'|-\s*(?:\d{4}\s+)?(?:digital(?:ly)?\s+)?remaster(?:ed)?(?:\s+\d{4})?(?:\s+version)?)\s*$',
+    re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r'\d+')
+ROMAN_NUMERAL_PATTERN = re.compile(r'^m{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+FUZZY_THRESHOLD = 0.9
+MAX_BLOCK_SIZE = 500
+BLOCK_TOKENS = 2
+BLOCK_PREFIX = 4
+
+def strip_latin_accents(value):
+    # Only accents on Latin letters are folded; in other scripts the combining
+    # marks carry meaning (dakuten in ハード, Devanagari vowel signs).
+    chars = []
+    base_is_latin = False
+    for c in unicodedata.normalize('NFD', value):
+        if unicodedata.combining(c):
+            if base_is_latin:
+                continue
+        else:
+            base_is_latin = unicodedata.name(c, '').startswith('LATIN')
+        chars.append(c)
+    return ''.join(chars)
+
+def fold_text(value):
+    value = strip_latin_accents(value)
+    value = unicodedata.normalize('NFKC', value).casefold()
+    value = value.replace('&', ' and ')
+    # Punctuation and symbols only; \W would also drop combining vowel signs.
+    value = ''.join(' ' if unicodedata.category(c)[0] in 'PS' else c for c in value)
+    return WHITESPACE_PATTERN.sub(' ', value).strip()
+
+def move_trailing_article(value):
+    # "Beatles, The" -> "The Beatles"
+    match = re.match(r'^(.*),\s*(the)$', value.strip(), re.IGNORECASE)
+    if match:
+        return f"{match.group(2)} {match.group(1)}"
+    return value
+
+def strip_leading_article(value):
+    for article in LEADING_ARTICLES:
+        if value.startswith(article) and len(value) > len(article):
+            return value[len(article):]
+    return value
+
+def strip_version_suffix(value):
+    previous = None
+    while previous != value:
+        previous = value
+        value = VERSION_PATTERN.sub('', value)
+    return value
+
+def normalize_title(title):
+    if not title:
+        return ''
+    title = strip_version_suffix(title)
+    title = FEATURING_PATTERN.sub('', title)
+    return fold_text(title)
+
+def normalize_artist(artist):
+    if not artist:
+        return ''
+    artist = FEATURING_PATTERN.sub('', artist)
+    artist = move_trailing_article(artist)
+    return strip_leading_article(fold_text(artist))
+
+def normalize_album(album):
+    if not album:
+        return ''
+    album = strip_version_suffix(album)
+    return strip_leading_article(fold_text(album))
+
+KEY_NORMALIZERS = (normalize_title, normalize_artist, normalize_album)
+
+def normalize_key(key):
+    # key is (title, artist) or (title, artist, album)
+    return tuple(normalize(value) for normalize, value in zip(KEY_NORMALIZERS, key))
+
+def block_keys(normalized_key):
+    title, artist = normalized_key[0], normalized_key[1]
+    title_tokens = sorted(set(title.split()), key=lambda t: (-len(t), t))[:BLOCK_TOKENS] or ['']
+    artist_tokens = sorted(set(artist.split()), key=lambda t: (-len(t), t))[:BLOCK_TOKENS] or ['']
+    return {
+        f"{a[:BLOCK_PREFIX]}|{t[:BLOCK_PREFIX]}"
+        for a in artist_tokens
+        for t in title_tokens
+    }
+
+def numbering(value):
+    # "Track 10", "Symphony No. 5", "Part II": these tokens identify the work,
+    # so two values only fuzzy-match when they carry exactly the same ones.
+    numbers = NUMBER_PATTERN.findall(value)
+    numerals = [token for token in value.split() if ROMAN_NUMERAL_PATTERN.match(token)]
+    return sorted(str(int(number)) for number in numbers), sorted(numerals)
+
+def similarity(key1, key2):
+    if any(numbering(a) != numbering(b) for a, b in zip(key1, key2)):
+        return 0.0
+    return min(SequenceMatcher(None, a, b).ratio() for a, b in zip(key1, key2))
+
+class DuplicateIndex:
+    # Maps every incoming tag tuple onto the first-seen tuple it duplicates.
+    # Exact matches on the normalized key are a dict lookup; fuzzy matches are
+    # only attempted against entries that share a token block. match() reports
+    # which of the two it was, since only an exact match is safe to act on.
+
+    def __init__(self, threshold=FUZZY_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.exact = {}
+        self.blocks = {}
+
+    def __len__(self):
+        return len(self.exact)
+
+    def candidates(self, normalized_key):
+        seen = set()
+        for block in block_keys(normalized_key):
+            members = self.blocks.get(block, ())
+            if len(members) > self.max_block_size:
+                continue
+            for candidate in members:
+                if candidate not in seen:
+                    seen.add(candidate)
+                    yield candidate
+
+    def find(self, normalized_key):
+        if normalized_key in self.exact:
+            return self.exact[normalized_key], True
+        best, best_score = None, self.threshold
+        for candidate in self.candidates(normalized_key):
+            if len(candidate) != len(normalized_key):
+                continue
+            score = similarity(normalized_key, candidate)
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None, False
+        return self.exact[best], False
+
+    def add(self, normalized_key, canonical):
+        self.exact.setdefault(normalized_key, canonical)
+        for block in block_keys(normalized_key):
+            self.blocks.setdefault(block, []).append(normalized_key)
+
+    def match(self, key):
+        normalized = normalize_key(key)
+        canonical, exact = self.find(normalized)
+        if canonical is None:
+            canonical, exact = key, True
+            self.add(normalized, canonical)
+        return canonical, exact
@@ -1,5 +1,3 @@
-import os
-import shutil
 import librosa
 import audioread
 from mutagen.easyid3 import EasyID3
@@ -9,6 +7,9 @@ from mutagen.oggvorbis import OggVorbis
 from mutagen.mp4 import MP4
 from mutagen.aiff import AIFF
 from pydub import AudioSegment
+from metadata_keys import DuplicateIndex
+from pipeline import LibraryPlacer
+from tag_writeback import apply_tag_writes
 
 SUPPORTED_FORMATS = ('.mp3', '.flac', '.ogg', '.wma', '.m4a', '.wav', '.aiff', '.alac', '.aac')
 FORMAT_PRIORITY = {
@@ -64,73 +65,71 @@ def merge_metadata(existing_metadata, new_metadata):
             merged_metadata[key] = value
     return merged_metadata
 
-def organize_music_library(source_folder, destination_folder, review_folder, test_mode=False, copy_mode=False):
-    library = {}
+def organize_music_library(source_folder, destination_folder, review_folder, test_mode=False, copy_mode=False, scheduled_io=False):
+    library_bitrate = {}
+    tag_merges = {}
     log_entries = []
-    
-    for root, _, files in os.walk(source_folder):
-        for file in files:
-            if not file.lower().endswith(SUPPORTED_FORMATS):
-                continue
-            
-            file_path = os.path.join(root, file)
-            metadata = get_audio_metadata(file_path)
-            
-            if metadata['title'] and metadata['artist'] and metadata['album']:
-                key = (metadata['title'], metadata['artist'], metadata['album'])
-                
-                if key not in library:
-                    library[key] = file_path
-                    log_entries.append(f"Adding {file_path} to library.")
-                else:
-                    existing_format = library[key].split('.')[-1]
-                    new_format = metadata['format']
-                    
-                    if FORMAT_PRIORITY[new_format] < FORMAT_PRIORITY[existing_format]:
-                        log_entries.append(f"Replacing {library[key]} with {file_path} due to higher quality format.")
-                        if not test_mode and not copy_mode:
-                            os.remove(library[key])
-                        library[key] = file_path
-                    elif FORMAT_PRIORITY[new_format] == FORMAT_PRIORITY[existing_format]:
-                        existing_bitrate = get_audio_metadata(library[key])['bitrate']
-                        new_bitrate = metadata['bitrate']
-                        
-                        if new_bitrate > existing_bitrate:
-                            log_entries.append(f"Replacing {library[key]} with {file_path} due to higher bitrate.")
-                            if not test_mode and not copy_mode:
-                                os.remove(library[key])
-                            library[key] = file_path
-                        elif new_bitrate == existing_bitrate:
-                            existing_metadata = get_audio_metadata(library[key])['metadata']
-                            new_metadata = metadata['metadata']
-                            merged_metadata = merge_metadata(existing_metadata, new_metadata)
-                            log_entries.append(f"Merging metadata for {file_path} with existing file.")
-                            # Here you can save the merged metadata back to the file if needed
-                        else:
-                            log_entries.append(f"Skipping {file_path} due to lower bitrate.")
-                            if not test_mode and not copy_mode:
-                                os.remove(file_path)
-                    else:
-                        log_entries.append(f"Skipping {file_path} due to lower quality format.")
-                        if not test_mode and not copy_mode:
-                            os.remove(file_path)
-            else:
-                log_entries.append(f"Moving {file_path} to review folder due to insufficient metadata.")
-                if not test_mode:
-                    os.makedirs(review_folder, exist_ok=True)
-                    shutil.move(file_path, os.path.join(review_folder, file))
-    
-    for (title, artist, album), file_path in library.items():
-        artist_folder = os.path.join(destination_folder, artist)
-        album_folder = os.path.join(artist_folder, album)
-        os.makedirs(album_folder, exist_ok=True)
-        log_entries.append(f"Copying {file_path} to {album_folder}.")
-        if not test_mode:
-            if copy_mode:
-                shutil.copy(file_path, os.path.join(album_folder, os.path.basename(file_path)))
+    index = DuplicateIndex()
+    placer = LibraryPlacer(destination_folder, review_folder, log_entries, test_mode, copy_mode)
+    library = placer.library
+
+    def replace(key, file_path, metadata):
+        library_bitrate[key] = metadata['bitrate']
+        tag_merges.pop(key, None)
+        return placer.replace(key, file_path)
+
+    def decide(file_path, metadata):
+        if not (metadata['title'] and metadata['artist'] and metadata['album']):
+            return placer.review(file_path, "due to insufficient metadata")
+
+        key, exact = index.match((metadata['title'], metadata['artist'], metadata['album']))
+        if not exact:
+            return placer.review(file_path, f"as a possible duplicate of {library[key]}")
+
+        if key not in library:
+            library_bitrate[key] = metadata['bitrate']
+            return placer.add(key, file_path)
+
+        existing_format = library[key].split('.')[-1]
+        new_format = metadata['format']
+
+        if FORMAT_PRIORITY[new_format] < FORMAT_PRIORITY[existing_format]:
+            log_entries.append(f"Replacing {library[key]} with {file_path} due to higher quality format.")
+            return replace(key, file_path, metadata)
+        elif FORMAT_PRIORITY[new_format] == FORMAT_PRIORITY[existing_format]:
+            existing_bitrate = library_bitrate[key]
+            new_bitrate = metadata['bitrate']
+
+            if new_bitrate > existing_bitrate:
+                log_entries.append(f"Replacing {library[key]} with {file_path} due to higher bitrate.")
+                return replace(key, file_path, metadata)
+            elif new_bitrate == existing_bitrate:
+                # Only the duplicate's tags are held; the kept file's own tags
+                # are read back once it has been placed.
+                tag_merges.setdefault(key, []).append(metadata['metadata'])
+                log_entries.append(f"Merging metadata for {file_path} with existing file.")
+                return []
             else:
-                shutil.move(file_path, os.path.join(album_folder, os.path.basename(file_path)))
-    
+                log_entries.append(f"Skipping {file_path} due to lower bitrate.")
+                return placer.remove(key, file_path)
+        else:
+            log_entries.append(f"Skipping {file_path} due to lower quality format.")
+            return placer.remove(key, file_path)
+
+    log_entries.extend(placer.run(source_folder, SUPPORTED_FORMATS, get_audio_metadata, decide, scheduled_io))
+
+    # Merged tags are written once every dedup decision is final, against the
+    # file's destination path so copy mode never modifies the source folder.
+    tag_writes = []
+    for key, new_metadata_list in tag_merges.items():
+        kept_path = placer.kept_path(key)
+        original_metadata = get_audio_metadata(kept_path)['metadata']
+        merged_metadata = original_metadata
+        for new_metadata in new_metadata_list:
+            merged_metadata = merge_metadata(merged_metadata, new_metadata)
+        tag_writes.append((kept_path, original_metadata, merged_metadata))
+    log_entries.extend(apply_tag_writes(tag_writes, dry_run=test_mode))
+
     with open("organize_music_log.txt", "w") as log_file:
         log_file.write("\n".join(log_entries))
 
@@ -140,5 +139,6 @@ if __name__ == "__main__":
     review_folder = "path/to/your/review/folder"
     test_mode = True  # Set to False to actually move or copy files
     copy_mode = True  # Set to True to copy files instead of moving them
+    scheduled_io = False  # Set to True to probe in physical disk order (spinning disks)
     
-    organize_music_library(source_folder, destination_folder, review_folder, test_mode, copy_mode)
+    organize_music_library(source_folder, destination_folder, review_folder, test_mode, copy_mode, scheduled_io)
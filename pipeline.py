@@ -0,0 +1,245 @@
+import os
+import queue
+import shutil
+import threading
+from functools import partial
+from io_scheduler import MAX_DEVICE_WORKERS, DeviceLimits, prefetch_tag_regions, walk_audio_directories
+
+QUEUE_SIZE = 64
+PROBE_WORKERS = 2
+ACT_WORKERS = 2
+
+_DONE = object()
+_FAILED = object()
+
+class _GroupEnd:
+    def __init__(self, group):
+        self.group = group
+
+def _admit(window, stop):
+    while not window.acquire(timeout=0.1):
+        if stop.is_set():
+            return False
+    return not stop.is_set()
+
+def _walk(groups, probe_queue, probe_workers, window, admit, stop, errors):
+    seq = 0
+    try:
+        for group, file_paths in groups:
+            for item in list(file_paths) + [_GroupEnd(group)]:
+                if not _admit(window, stop):
+                    return
+                if admit and not isinstance(item, _GroupEnd):
+                    admit(item)
+                probe_queue.put((seq, item))
+                seq += 1
+    except Exception as e:
+        errors.append(f"Error walking files: {e}")
+    finally:
+        for _ in range(probe_workers):
+            probe_queue.put(_DONE)
+
+def _probe(probe, probe_queue, decide_queue, errors):
+    while True:
+        item = probe_queue.get()
+        if item is _DONE:
+            decide_queue.put(_DONE)
+            return
+        seq, file_path = item
+        if isinstance(file_path, _GroupEnd):
+            decide_queue.put((seq, file_path, None))
+            continue
+        try:
+            result = probe(file_path)
+        except Exception as e:
+            errors.append(f"Error probing {file_path}: {e}")
+            result = _FAILED
+        decide_queue.put((seq, file_path, result))
+
+def _act(act_queue, errors):
+    while True:
+        action = act_queue.get()
+        if action is _DONE:
+            return
+        try:
+            action()
+        except Exception as e:
+            errors.append(f"Error applying action: {e}")
+
+def _start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def run_pipeline(groups, probe, decide, settle=None, admit=None,
+                 probe_workers=PROBE_WORKERS, act_workers=ACT_WORKERS, queue_size=QUEUE_SIZE):
+    # Streams files through walk -> probe -> decide -> act over bounded queues,
+    # so a full queue blocks the stage feeding it instead of buffering the
+    # whole library in memory. The window caps how far the walker may run
+    # ahead of the decider, which also bounds the reorder buffer below.
+    #
+    # groups yields (group, file_paths); decide(file_path, result) runs on the
+    # calling thread in walk order, settle(group) once every file of a group has
+    # been decided, and admit(file_path) on the walker thread as a file enters
+    # the window, ahead of its probe. decide and settle each return a list of
+    # (serial_key, action) pairs; actions sharing a serial key run in order on
+    # the same executor thread. Returns the errors raised by probes or actions.
+    errors = []
+    stop = threading.Event()
+    window = threading.Semaphore(queue_size * 2)
+    probe_queue = queue.Queue(maxsize=queue_size)
+    decide_queue = queue.Queue(maxsize=queue_size)
+    act_queues = [queue.Queue(maxsize=queue_size) for _ in range(act_workers)]
+
+    threads = [_start(_walk, groups, probe_queue, probe_workers, window, admit, stop, errors)]
+    threads += [_start(_probe, probe, probe_queue, decide_queue, errors) for _ in range(probe_workers)]
+    actors = [_start(_act, act_queue, errors) for act_queue in act_queues]
+
+    def dispatch(actions):
+        for serial_key, action in actions or ():
+            act_queues[hash(serial_key) % act_workers].put(action)
+
+    try:
+        # Probe workers finish out of order; hold results back until the next
+        # sequence number arrives so decisions stay in walk order.
+        pending = {}
+        next_seq = 0
+        finished_probes = 0
+        while finished_probes < probe_workers:
+            item = decide_queue.get()
+            if item is _DONE:
+                finished_probes += 1
+                continue
+            seq, file_path, result = item
+            pending[seq] = (file_path, result)
+            while next_seq in pending:
+                file_path, result = pending.pop(next_seq)
+                next_seq += 1
+                window.release()
+                if isinstance(file_path, _GroupEnd):
+                    if settle:
+                        dispatch(settle(file_path.group))
+                elif result is not _FAILED:
+                    dispatch(decide(file_path, result))
+    finally:
+        stop.set()
+        # Drain anything a stopped walker or probe worker may still be
+        # blocked on so every thread can reach its sentinel.
+        while any(thread.is_alive() for thread in threads):
+            try:
+                decide_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for act_queue in act_queues:
+            act_queue.put(_DONE)
+        for actor in actors:
+            actor.join()
+
+    return errors
+
+def scan_library(source_folder, extensions, probe, decide, settle=None, scheduled_io=False, exclude=()):
+    # The walk and probe configuration every organizer runs with. With the
+    # scheduler on, files are read in physical order within each directory
+    # (ordering across directories would need the whole listing up front),
+    # prefetch hints go out as files enter the window, and probes are capped
+    # per device by an AdaptiveLimit that admits them in walk order.
+    groups = walk_audio_directories(source_folder, extensions, scheduled=scheduled_io, exclude=exclude)
+    if scheduled_io:
+        limits = DeviceLimits()
+
+        def admit(file_path):
+            # Walker thread, in walk order: the ticket keeps probes in that
+            # order whichever probe worker picks the file up.
+            limits.admit(file_path)
+            prefetch_tag_regions(file_path)
+
+        return run_pipeline(groups, partial(limits.run, probe), decide, settle,
+                            admit=admit, probe_workers=MAX_DEVICE_WORKERS)
+    return run_pipeline(groups, probe, decide, settle)
+
+def move_to_review(file_path, review_folder):
+    os.makedirs(review_folder, exist_ok=True)
+    shutil.move(file_path, os.path.join(review_folder, os.path.basename(file_path)))
+
+def place_file(file_path, destination_path, copy_mode):
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+    if copy_mode:
+        shutil.copy(file_path, destination_path)
+    else:
+        shutil.move(file_path, destination_path)
+
+class LibraryPlacer:
+    # The file-moving half of an organizer: tracks the kept file for every
+    # (title, artist, album) key and turns dedup decisions into executor
+    # actions. The organizer keeps its own quality data and decides; every
+    # method here returns the actions for run_pipeline to dispatch.
+
+    def __init__(self, destination_folder, review_folder, log_entries, test_mode=False, copy_mode=False):
+        self.destination_folder = destination_folder
+        self.review_folder = review_folder
+        self.log_entries = log_entries
+        self.test_mode = test_mode
+        self.copy_mode = copy_mode
+        self.library = {}
+        self.placed = {}
+        self.unsettled = []
+
+    def act(self, serial_key, action, *args):
+        if self.test_mode:
+            return []
+        return [(serial_key, partial(action, *args))]
+
+    def review(self, file_path, reason):
+        self.log_entries.append(f"Moving {file_path} to review folder {reason}.")
+        return self.act(file_path, move_to_review, file_path, self.review_folder)
+
+    def add(self, key, file_path):
+        self.library[key] = file_path
+        self.unsettled.append(key)
+        self.log_entries.append(f"Adding {file_path} to library.")
+        return []
+
+    def remove(self, key, file_path):
+        if self.copy_mode:
+            return []
+        return self.act(key, os.remove, file_path)
+
+    def place(self, key):
+        title, artist, album = key
+        file_path = self.library[key]
+        album_folder = os.path.join(self.destination_folder, artist, album)
+        self.placed[key] = os.path.join(album_folder, os.path.basename(file_path))
+        self.log_entries.append(f"Copying {file_path} to {album_folder}.")
+        return self.act(key, place_file, file_path, self.placed[key], self.copy_mode)
+
+    def replace(self, key, file_path):
+        # A key that is already placed has its destination file swapped out;
+        # otherwise the old source is dropped and placement waits for settle.
+        if key in self.placed:
+            actions = self.act(key, os.remove, self.placed.pop(key))
+        else:
+            actions = self.remove(key, self.library[key])
+        self.library[key] = file_path
+        if key not in self.unsettled:
+            actions += self.place(key)
+        return actions
+
+    def settle(self, directory):
+        # Every file in this directory has been decided, so duplicates sitting
+        # side by side are resolved and the winners can be placed while the
+        # scan carries on. A better copy found later still replaces them.
+        actions = []
+        for key in self.unsettled:
+            actions += self.place(key)
+        self.unsettled.clear()
+        return actions
+
+    def kept_path(self, key):
+        # Where the kept file is once the pipeline has drained.
+        if self.test_mode:
+            return self.library[key]
+        return self.placed[key]
+
+    def run(self, source_folder, extensions, probe, decide, scheduled_io=False):
+        return scan_library(source_folder, extensions, probe, decide, self.settle, scheduled_io,
+                            exclude=(self.destination_folder, self.review_folder))
@@ -0,0 +1,133 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from mutagen.easyid3 import EasyID3
+from mutagen.mp3 import MP3
+from mutagen.flac import FLAC
+from mutagen.oggvorbis import OggVorbis
+from mutagen.mp4 import MP4
+from mutagen.aiff import AIFF
+from io_scheduler import device_workers, order_for_reads
+
+MAX_PENDING_WRITES = 64
+
+class NoPaddingRoom(Exception):
+    pass
+
+def open_for_tags(file_path):
+    # Same classes organize_music_library.get_audio_metadata reads with, so the
+    # merged keys line up with what the file exposes.
+    if file_path.endswith('.mp3'):
+        return MP3(file_path, ID3=EasyID3)
+    elif file_path.endswith('.flac'):
+        return FLAC(file_path)
+    elif file_path.endswith('.ogg'):
+        return OggVorbis(file_path)
+    elif file_path.endswith('.m4a') or file_path.endswith('.alac') or file_path.endswith('.aac'):
+        return MP4(file_path)
+    elif file_path.endswith('.aiff'):
+        return AIFF(file_path)
+    return None
+
+def id3_save_options(file_path, audio):
+    # mutagen writes ID3v2.4 unless told otherwise; upgrading a v2.3 tag can
+    # change its size and force a full rewrite, so keep the file's version.
+    # AIFF exposes the version on its tags, EasyID3 does not, so MP3 falls back
+    # to the major version byte of the ID3v2 header at the start of the file.
+    version = getattr(audio.tags, 'version', None)
+    if version is None and file_path.endswith('.mp3'):
+        with open(file_path, 'rb') as f:
+            header = f.read(4)
+        if header[:3] == b'ID3':
+            version = (2, header[3])
+    if version is not None and tuple(version[:2]) == (2, 3):
+        return {'v2_version': 3}
+    return {}
+
+def tag_changes(original_metadata, merged_metadata):
+    return {
+        key: value
+        for key, value in merged_metadata.items()
+        if original_metadata.get(key) != value
+    }
+
+def describe_changes(file_path, original_metadata, changes):
+    lines = [f"Tag changes for {file_path}:"]
+    for key, value in sorted(changes.items()):
+        lines.append(f"  {key}: {original_metadata.get(key)!r} -> {value!r}")
+    return lines
+
+def write_tags(file_path, changes, allow_rewrite=True):
+    # mutagen hands the padding callback the room left over once the new tags
+    # are laid out (ID3v2 padding, FLAC PADDING block, MP4 free atoms). Keeping
+    # that exact amount leaves the file size unchanged, so only the tag region
+    # is rewritten and the audio data is not moved.
+    audio = open_for_tags(file_path)
+    if audio is None:
+        return 'unsupported'
+    if audio.tags is None:
+        audio.add_tags()
+    save_options = id3_save_options(file_path, audio)
+    for key, value in changes.items():
+        audio[key] = value
+
+    result = {}
+
+    def padding(info):
+        if info.padding >= 0:
+            result['mode'] = 'in place'
+            return info.padding
+        if not allow_rewrite:
+            raise NoPaddingRoom(file_path)
+        result['mode'] = 'rewritten'
+        return info.get_default_padding()
+
+    try:
+        audio.save(padding=padding, **save_options)
+    except NoPaddingRoom:
+        return 'skipped'
+    # Formats that never consult the padding callback give no way to tell.
+    return result.get('mode', 'unknown')
+
+def _apply(write, allow_rewrite):
+    file_path, original_metadata, merged_metadata = write
+    changes = tag_changes(original_metadata, merged_metadata)
+    if not changes:
+        return file_path, 'unchanged'
+    try:
+        return file_path, write_tags(file_path, changes, allow_rewrite)
+    except Exception as e:
+        return file_path, f"failed ({e})"
+
+def apply_tag_writes(writes, dry_run=False, allow_rewrite=True, max_workers=None, max_pending=MAX_PENDING_WRITES):
+    # writes is a list of (file_path, original_metadata, merged_metadata).
+    log_entries = []
+    by_path = {write[0]: write for write in writes}
+
+    if dry_run:
+        for file_path in sorted(by_path):
+            _, original_metadata, merged_metadata = by_path[file_path]
+            changes = tag_changes(original_metadata, merged_metadata)
+            if changes:
+                log_entries.extend(describe_changes(file_path, original_metadata, changes))
+        return log_entries
+
+    ordered = [by_path[file_path] for file_path in order_for_reads(list(by_path))]
+    if not ordered:
+        return log_entries
+    if max_workers is None:
+        # Writes all land in the destination library, so size the pool for
+        # that device; a single writer keeps a spinning disk in read order.
+        max_workers = device_workers(ordered[0][0])
+    # Up to max_pending writes are queued at once, so the workers never run
+    # dry while results are logged, in submission order, as they complete.
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for write in ordered:
+            pending.append(executor.submit(_apply, write, allow_rewrite))
+            while len(pending) >= max_pending:
+                file_path, mode = pending.popleft().result()
+                log_entries.append(f"Writing merged tags to {file_path}: {mode}.")
+        while pending:
+            file_path, mode = pending.popleft().result()
+            log_entries.append(f"Writing merged tags to {file_path}: {mode}.")
+    return log_entries
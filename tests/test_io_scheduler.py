@@ -0,0 +1,164 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import io_scheduler
+from io_scheduler import walk_audio_directories
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('x')
+
+
+def walked(folder, **kwargs):
+    return sorted(
+        os.path.relpath(file_path, folder)
+        for _, file_paths in walk_audio_directories(folder, ('.mp3',), **kwargs)
+        for file_path in file_paths
+    )
+
+
+def test_walk_prunes_excluded_directories(tmp_path):
+    source = tmp_path / 'music'
+    touch(str(source / 'a' / '1.mp3'))
+    touch(str(source / 'library' / 'Artist' / 'Album' / '1.mp3'))
+    touch(str(source / 'review' / '2.mp3'))
+
+    assert walked(str(source), exclude=(str(source / 'library'), str(source / 'review'))) == [
+        os.path.join('a', '1.mp3'),
+    ]
+
+
+def test_walk_prunes_excluded_directories_given_as_other_spellings(tmp_path):
+    source = tmp_path / 'music'
+    touch(str(source / 'a' / '1.mp3'))
+    touch(str(source / 'library' / '1.mp3'))
+
+    assert walked(str(source), exclude=(str(source / 'a' / '..' / 'library') + os.sep,)) == [
+        os.path.join('a', '1.mp3'),
+    ]
+
+
+
+def test_order_for_reads_sorts_by_physical_offset_then_inode(tmp_path, monkeypatch):
+    paths = [str(tmp_path / name) for name in ('a.mp3', 'b.mp3', 'c.mp3', 'd.mp3')]
+    for path in paths:
+        touch(path)
+    offsets = {paths[0]: 300, paths[1]: None, paths[2]: 100, paths[3]: 200}
+    monkeypatch.setattr(io_scheduler, 'physical_offset', offsets.get)
+
+    dev = os.stat(paths[1]).st_dev
+    assert io_scheduler.read_order_key(paths[2]) == (dev, 0, 100, paths[2])
+    assert io_scheduler.read_order_key(paths[1]) == (dev, 1, os.stat(paths[1]).st_ino, paths[1])
+    assert io_scheduler.order_for_reads(paths) == [paths[2], paths[3], paths[0], paths[1]]
+
+
+def test_order_for_reads_keeps_missing_files(tmp_path):
+    present = str(tmp_path / 'a.mp3')
+    touch(present)
+    missing = str(tmp_path / 'gone.mp3')
+    assert sorted(io_scheduler.order_for_reads([present, missing])) == sorted([present, missing])
+
+
+class FakeFcntl:
+    def __init__(self, extents=0, physical=0, error=None):
+        self.extents = extents
+        self.physical = physical
+        self.error = error
+
+    def ioctl(self, fd, request, buffer):
+        assert request == io_scheduler.FS_IOC_FIEMAP
+        if self.error:
+            raise self.error
+        header = list(io_scheduler.FIEMAP_HEADER.unpack_from(buffer, 0))
+        header[3] = self.extents
+        io_scheduler.FIEMAP_HEADER.pack_into(buffer, 0, *header)
+        if self.extents:
+            io_scheduler.FIEMAP_EXTENT.pack_into(
+                buffer, io_scheduler.FIEMAP_HEADER.size, 0, self.physical, 4096, 0, 0, 0, 0, 0, 0)
+
+
+def test_physical_offset_parses_the_first_extent(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.mp3')
+    touch(path)
+    monkeypatch.setattr(io_scheduler.sys, 'platform', 'linux')
+    monkeypatch.setattr(io_scheduler, 'fcntl', FakeFcntl(extents=1, physical=123456789))
+    assert io_scheduler.physical_offset(path) == 123456789
+
+
+def test_physical_offset_falls_back_without_extents(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.mp3')
+    touch(path)
+    monkeypatch.setattr(io_scheduler.sys, 'platform', 'linux')
+    monkeypatch.setattr(io_scheduler, 'fcntl', FakeFcntl(extents=0))
+    assert io_scheduler.physical_offset(path) is None
+    monkeypatch.setattr(io_scheduler, 'fcntl', FakeFcntl(error=OSError('unsupported')))
+    assert io_scheduler.physical_offset(path) is None
+    monkeypatch.setattr(io_scheduler, 'fcntl', None)
+    assert io_scheduler.physical_offset(path) is None
+    assert io_scheduler.read_order_key(path)[1:3] == (1, os.stat(path).st_ino)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_adaptive_limit_climbs_within_bounds_and_flips_on_slowdown(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(io_scheduler, 'time', clock)
+    limit = io_scheduler.AdaptiveLimit(1, maximum=3, window=1)
+
+    limits = []
+    for elapsed in (1, 1, 1, 2, 2, 2):
+        with limit:
+            clock.now += elapsed
+        limits.append(limit.limit)
+    assert limits == [2, 3, 3, 2, 1, 1]
+
+
+def test_rotational_device_limit_stays_at_one(monkeypatch):
+    monkeypatch.setattr(io_scheduler, 'is_rotational', lambda file_path: True)
+    limit = io_scheduler.device_limit('any.mp3')
+    for _ in range(io_scheduler.ADAPT_WINDOW * 4):
+        with limit:
+            pass
+    assert limit.limit == 1
+
+
+def test_adaptive_limit_admits_in_ticket_order():
+    limit = io_scheduler.AdaptiveLimit(1, maximum=1)
+    started = []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(limit.run, started.append, n, limit.ticket()) for n in range(200)]
+        for future in futures:
+            future.result()
+    assert started == list(range(200))
+
+
+def test_device_limits_run_in_admission_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(io_scheduler, 'is_rotational', lambda file_path: True)
+    paths = [str(tmp_path / f'{n:03}.mp3') for n in range(50)]
+    for path in paths:
+        touch(path)
+    limits = io_scheduler.DeviceLimits()
+    for path in paths:
+        limits.admit(path)
+    started = []
+    # One thread per file, started in reverse, so only the tickets set the order.
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        list(pool.map(lambda path: limits.run(started.append, path), reversed(paths)))
+    assert started == paths
+
+
+def test_scheduled_probe_yields_every_file_once(tmp_path):
+    paths = [str(tmp_path / f'{n:03}.mp3') for n in range(100)]
+    for path in paths:
+        touch(path)
+    results = list(io_scheduler.scheduled_probe(paths, os.path.basename))
+    assert sorted(file_path for file_path, _ in results) == paths
+    assert all(result == os.path.basename(file_path) for file_path, result in results)
@@ -0,0 +1,90 @@
+from metadata_keys import DuplicateIndex, normalize_key
+
+
+def match_all(keys):
+    index = DuplicateIndex()
+    return [index.match(key) for key in keys]
+
+
+def test_exact_duplicates_share_a_key():
+    (first, first_exact), (second, second_exact) = match_all([
+        ('Hey Jude', 'The Beatles', '1'),
+        ('Hey Jude (Remastered 2015)', 'Beatles, The', '1'),
+    ])
+    assert first_exact and second_exact
+    assert second == first
+
+
+def test_numbered_tracks_stay_distinct():
+    keys = [(f'Track {n}', 'Artist', 'Album') for n in range(1, 21)]
+    results = match_all(keys)
+    assert [key for key, _ in results] == keys
+    assert all(exact for _, exact in results)
+
+
+def test_generated_titles_stay_distinct():
+    keys = [(f'm{n}', 'Artist', 'Album') for n in range(200)]
+    assert [key for key, _ in match_all(keys)] == keys
+
+
+def test_classical_numbering_is_not_merged():
+    pairs = [
+        ('Symphony No. 5', 'Symphony No. 6'),
+        ('Piano Concerto No. 1 in E minor', 'Piano Concerto No. 2 in F minor'),
+        ('Piano Sonata No. 14', 'Piano Sonata No. 15'),
+        ('Suite Part II', 'Suite Part III'),
+    ]
+    for first, second in pairs:
+        results = match_all([(first, 'Composer', 'Album'), (second, 'Composer', 'Album')])
+        assert results[1] == ((second, 'Composer', 'Album'), True), (first, second)
+
+
+def test_fuzzy_match_is_reported_as_not_exact():
+    index = DuplicateIndex()
+    index.match(('Bohemian Rhapsody', 'Queen', 'A Night at the Opera'))
+    key, exact = index.match(('Bohemian Rapsody', 'Queen', 'A Night at the Opera'))
+    assert key == ('Bohemian Rhapsody', 'Queen', 'A Night at the Opera')
+    assert not exact
+
+
+def test_fuzzy_match_requires_same_numbering():
+    index = DuplicateIndex()
+    index.match(('Bohemian Rhapsody 2', 'Queen', 'Album'))
+    key, exact = index.match(('Bohemian Rapsody 3', 'Queen', 'Album'))
+    assert key == ('Bohemian Rapsody 3', 'Queen', 'Album')
+    assert exact
+
+
+def test_normalize_key_folds_case_articles_and_featuring():
+    assert normalize_key(('Señorita (feat. Someone)', 'Beatles, The', 'Help!')) == \
+        normalize_key(('SENORITA', 'The Beatles', 'help'))
+
+
+def test_accent_folding_is_limited_to_latin():
+    assert normalize_key(('Beyoncé', 'Señorita')) == normalize_key(('Beyonce', 'Senorita'))
+    assert normalize_key(('ハート', 'A')) != normalize_key(('ハード', 'A'))
+    assert normalize_key(('किताब', 'A')) != normalize_key(('कीताब', 'A'))
+    assert normalize_key(('किताब', 'A')) != normalize_key(('कताब', 'A'))
+
+
+def test_featuring_needs_preceding_text():
+    assert normalize_key(('Feat of Strength', 'A')) == ('feat of strength', 'a')
+    assert normalize_key(('Ft. Worth Blues', 'A')) == ('ft worth blues', 'a')
+    assert normalize_key(('Rock Feat of Strength', 'A')) == ('rock feat of strength', 'a')
+    for title in ('Song ft. Y', 'Song (feat. Y)', 'Song - feat. Y', 'Song [Ft Y]', 'Song featuring Y'):
+        assert normalize_key((title, 'A')) == ('song', 'a'), title
+
+
+def test_mixes_and_edits_stay_distinct():
+    results = match_all([
+        ('Help! (Mono)', 'The Beatles', 'Help!'),
+        ('Help! (Stereo)', 'The Beatles', 'Help!'),
+        ('Help!', 'The Beatles', 'Help!'),
+    ])
+    assert [key for key, _ in results] == [
+        ('Help! (Mono)', 'The Beatles', 'Help!'),
+        ('Help! (Stereo)', 'The Beatles', 'Help!'),
+        ('Help!', 'The Beatles', 'Help!'),
+    ]
+    (_, _), (song, exact) = match_all([('Song', 'Artist'), ('Song (Explicit)', 'Artist')])
+    assert not (song == ('Song', 'Artist') and exact)
@@ -0,0 +1,177 @@
+import os
+import random
+import threading
+import time
+
+from pipeline import LibraryPlacer, run_pipeline
+
+
+def groups_of(sizes):
+    return [(f'dir{g}', [f'dir{g}/{n}.mp3' for n in range(size)]) for g, size in enumerate(sizes)]
+
+
+def slow_probe(file_path):
+    time.sleep(random.random() / 1000)
+    return file_path.upper()
+
+
+def run_with_timeout(func, timeout=10):
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'pipeline did not drain'
+    return outcome
+
+
+def test_decisions_follow_walk_order_with_several_probe_workers():
+    groups = groups_of([30, 1, 50, 7])
+    decided = []
+
+    def decide(file_path, result):
+        assert result == file_path.upper()
+        decided.append(file_path)
+        return []
+
+    errors = run_pipeline(groups, slow_probe, decide, probe_workers=4, queue_size=8)
+
+    assert errors == []
+    assert decided == [file_path for _, file_paths in groups for file_path in file_paths]
+
+
+def test_settle_runs_once_per_directory_after_its_files():
+    groups = groups_of([5, 3, 8])
+    events = []
+
+    def decide(file_path, result):
+        events.append(('decide', file_path))
+        return []
+
+    def settle(group):
+        events.append(('settle', group))
+        return []
+
+    run_pipeline(groups, slow_probe, decide, settle, probe_workers=3, queue_size=2)
+
+    expected = []
+    for group, file_paths in groups:
+        expected += [('decide', file_path) for file_path in file_paths]
+        expected.append(('settle', group))
+    assert events == expected
+
+
+def test_actions_for_one_key_run_in_dispatch_order():
+    groups = groups_of([40])
+    applied = []
+
+    def decide(file_path, result):
+        return [('key', lambda file_path=file_path: applied.append(file_path))]
+
+    run_pipeline(groups, slow_probe, decide, act_workers=3)
+
+    assert applied == groups[0][1]
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_replace_swaps_out_an_already_placed_file(tmp_path):
+    source = tmp_path / 'source'
+    destination = tmp_path / 'library'
+    write(str(source / 'a' / 'first.mp3'), 'first')
+    write(str(source / 'b' / 'second.mp3'), 'second')
+    key = ('Title', 'Artist', 'Album')
+    log_entries = []
+    placer = LibraryPlacer(str(destination), str(tmp_path / 'review'), log_entries)
+
+    def decide(file_path, result):
+        if result in placer.library:
+            assert placer.placed, 'the first file should already be placed'
+            return placer.replace(result, file_path)
+        return placer.add(result, file_path)
+
+    groups = [
+        (str(source / 'a'), [str(source / 'a' / 'first.mp3')]),
+        (str(source / 'b'), [str(source / 'b' / 'second.mp3')]),
+    ]
+    errors = run_pipeline(groups, lambda file_path: key, decide, placer.settle)
+
+    album_folder = destination / 'Artist' / 'Album'
+    assert errors == []
+    assert sorted(os.listdir(str(album_folder))) == ['second.mp3']
+    assert placer.kept_path(key) == str(album_folder / 'second.mp3')
+    assert not (source / 'b' / 'second.mp3').exists()
+    assert log_entries[-1] == f"Copying {source / 'b' / 'second.mp3'} to {album_folder}."
+
+
+def test_duplicates_in_one_directory_are_placed_once(tmp_path):
+    source = tmp_path / 'source'
+    write(str(source / 'a' / 'low.mp3'), 'low')
+    write(str(source / 'a' / 'high.mp3'), 'high')
+    key = ('Title', 'Artist', 'Album')
+    placer = LibraryPlacer(str(tmp_path / 'library'), str(tmp_path / 'review'), [])
+
+    def decide(file_path, result):
+        if result in placer.library:
+            return placer.replace(result, file_path)
+        return placer.add(result, file_path)
+
+    groups = [(str(source / 'a'), [str(source / 'a' / 'low.mp3'), str(source / 'a' / 'high.mp3')])]
+    assert run_pipeline(groups, lambda file_path: key, decide, placer.settle) == []
+
+    assert os.listdir(str(tmp_path / 'library' / 'Artist' / 'Album')) == ['high.mp3']
+    assert not (source / 'a' / 'low.mp3').exists()
+
+
+def test_probe_errors_are_reported_and_skipped():
+    groups = groups_of([20, 20])
+    decided = []
+
+    def probe(file_path):
+        if file_path.endswith('3.mp3'):
+            raise ValueError('corrupt')
+        return file_path
+
+    def decide(file_path, result):
+        decided.append(file_path)
+        return []
+
+    outcome = run_with_timeout(lambda: run_pipeline(groups, probe, decide, probe_workers=4, queue_size=2))
+
+    failed = [file_path for _, file_paths in groups for file_path in file_paths if file_path.endswith('3.mp3')]
+    assert sorted(outcome['result']) == sorted(f"Error probing {file_path}: corrupt" for file_path in failed)
+    assert decided == [file_path for _, file_paths in groups for file_path in file_paths if file_path not in failed]
+
+
+def test_raising_decide_drains_without_hanging():
+    groups = groups_of([200])
+
+    def decide(file_path, result):
+        if file_path.endswith('/5.mp3'):
+            raise RuntimeError('bad decision')
+        return []
+
+    outcome = run_with_timeout(lambda: run_pipeline(groups, slow_probe, decide, probe_workers=4, queue_size=2))
+
+    assert isinstance(outcome.get('error'), RuntimeError)
+
+
+def test_failing_actions_are_reported():
+    groups = groups_of([3])
+
+    def fail():
+        raise OSError('disk full')
+
+    errors = run_pipeline(groups, slow_probe, lambda file_path, result: [(file_path, fail)])
+
+    assert errors == ["Error applying action: disk full"] * 3
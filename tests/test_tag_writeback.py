@@ -0,0 +1,104 @@
+import os
+import struct
+
+import pytest
+
+pytest.importorskip('mutagen')
+
+from mutagen.flac import FLAC
+from mutagen.id3 import ID3
+
+from tag_writeback import apply_tag_writes, write_tags
+
+
+def flac_file(path, padding=1024):
+    # fLaC marker, a STREAMINFO block (44.1 kHz, stereo, 16 bit), a PADDING
+    # block and a stand-in for the audio frames.
+    bits = (4096 << 256) | (4096 << 240) | (44100 << 172) | (1 << 169) | (15 << 164) | (44100 << 128)
+    streaminfo = bits.to_bytes(34, 'big')
+    with open(path, 'wb') as f:
+        f.write(b'fLaC')
+        f.write(bytes([0]) + len(streaminfo).to_bytes(3, 'big') + streaminfo)
+        f.write(bytes([0x80 | 1]) + padding.to_bytes(3, 'big') + b'\0' * padding)
+        f.write(b'\xff\xf8' + b'\0' * 2000)
+    return str(path)
+
+
+def syncsafe(n):
+    return bytes([(n >> 21) & 0x7f, (n >> 14) & 0x7f, (n >> 7) & 0x7f, n & 0x7f])
+
+
+def mp3_file(path, title='Title', padding=1024):
+    # ID3v2.3 tag with a TIT2 frame and padding, then MPEG-1 Layer III frames.
+    text = b'\0' + title.encode('latin-1')
+    body = b'TIT2' + struct.pack('>I', len(text)) + b'\0\0' + text + b'\0' * padding
+    with open(path, 'wb') as f:
+        f.write(b'ID3\x03\x00\x00' + syncsafe(len(body)) + body)
+        f.write((b'\xff\xfb\x90\x64' + b'\0' * 413) * 20)
+    return str(path)
+
+
+def test_flac_tags_are_written_into_padding(tmp_path):
+    path = flac_file(tmp_path / 'song.flac')
+    size = os.path.getsize(path)
+
+    assert write_tags(path, {'title': ['New Title']}) == 'in place'
+    assert os.path.getsize(path) == size
+    assert FLAC(path)['title'] == ['New Title']
+
+
+def test_write_is_skipped_when_tags_outgrow_padding(tmp_path):
+    path = flac_file(tmp_path / 'song.flac', padding=4)
+    with open(path, 'rb') as f:
+        original = f.read()
+
+    assert write_tags(path, {'title': ['x' * 100]}, allow_rewrite=False) == 'skipped'
+    with open(path, 'rb') as f:
+        assert f.read() == original
+    assert write_tags(path, {'title': ['x' * 100]}) == 'rewritten'
+
+
+def test_mp3_keeps_its_id3_version(tmp_path):
+    path = mp3_file(tmp_path / 'song.mp3')
+    size = os.path.getsize(path)
+
+    assert write_tags(path, {'title': ['New Title'], 'artist': ['Artist']}) == 'in place'
+    assert os.path.getsize(path) == size
+    tags = ID3(path)
+    assert tags.version[:2] == (2, 3)
+    assert str(tags['TIT2']) == 'New Title'
+
+
+def test_dry_run_describes_only_the_changes(tmp_path):
+    path = mp3_file(tmp_path / 'song.mp3')
+    with open(path, 'rb') as f:
+        original = f.read()
+
+    log = apply_tag_writes([
+        (path, {'title': ['Title'], 'genre': ['Rock']}, {'title': ['Title'], 'genre': ['Pop'], 'album': ['Album']}),
+        (str(tmp_path / 'same.mp3'), {'title': ['A']}, {'title': ['A']}),
+    ], dry_run=True)
+
+    assert log == [
+        f"Tag changes for {path}:",
+        "  album: None -> ['Album']",
+        "  genre: ['Rock'] -> ['Pop']",
+    ]
+    with open(path, 'rb') as f:
+        assert f.read() == original
+
+
+def test_apply_tag_writes_logs_every_write(tmp_path):
+    writes = [
+        (mp3_file(tmp_path / f'{n}.mp3'), {'title': ['Title']}, {'title': [f'Title {n}']})
+        for n in range(5)
+    ]
+    writes.append((flac_file(tmp_path / 'same.flac'), {'title': ['A']}, {'title': ['A']}))
+
+    log = apply_tag_writes(writes, max_workers=2, max_pending=2)
+
+    assert sorted(log) == sorted(
+        [f"Writing merged tags to {write[0]}: in place." for write in writes[:5]]
+        + [f"Writing merged tags to {writes[5][0]}: unchanged."]
+    )
+    assert [str(ID3(write[0])['TIT2']) for write in writes[:5]] == [f'Title {n}' for n in range(5)]